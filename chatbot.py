@@ -1,9 +1,23 @@
 import customtkinter as ctk
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import threading
+import asyncio
+import queue
+import functools
+import sys
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import re
+import os
+import time
+import shelve
+import hashlib
+import sqlite3
+import importlib.util
 
 # 1. Use better_profanity for bad language detection
 try:
@@ -11,8 +25,27 @@ try:
 except ImportError:
     raise ImportError("Please install better_profanity library: pip install better-profanity")
 
-# Initialize/censor words
-profanity.load_censor_words()
+# Optional: faster JSON parsing; stdlib json is used otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional: async HTTP client used to fan out the per-answer evaluations.
+# Without it the fan-out runs call_gemini_api in worker threads instead.
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Optional: numpy for the semantic cache. The heavier optional packages
+# (sentence-transformers, numba, hyperscan, re2) are only imported by the
+# background warm-up, see warm_caches().
+try:
+    import numpy as np
+except ImportError:
+    np = None
+numba = None  # set once the similarity kernel is compiled
 
 # 2. Manually curated college data (no "professors" entry)
 COLLEGE_INFO = {
@@ -43,7 +76,12 @@ COLLEGE_INFO = {
     }
 }
 
-SYSTEM_PROMPT = f"""
+@functools.cache
+def get_system_prompt():
+    """
+    Build the system prompt from COLLEGE_INFO on first use (then reuse it).
+    """
+    return sys.intern(f"""
 You are JoSi, the official placement and academic guide chatbot for St. Xavier's College, Mumbai. 
 Use the following knowledge to answer queries precisely:
 
@@ -71,17 +109,185 @@ You can provide:
 4. Highest package is exactly 24 LPA, be precise if asked.
 
 NOTE: If you are returning data for a "company check," respond EXACTLY with "VALID" or "INVALID" and nothing else.
-"""
+""")
 
 # 3. API Configuration
-API_KEY = "api key here"  # <-- Replace with your real API key
 API_URL = "https://generativelanguage.googleapis.com/v1/models/gemini-2.0-flash:generateContent"
 
-def call_gemini_api(prompt):
+@functools.cache
+def get_api_key():
+    """
+    Read the Gemini API key from the GEMINI_API_KEY environment variable.
+    """
+    key = os.environ.get("GEMINI_API_KEY")
+    if not key:
+        raise RuntimeError("GEMINI_API_KEY environment variable is not set")
+    return key
+
+# Context caching lives on v1beta and needs an explicit model version
+CACHED_MODEL = "models/gemini-2.0-flash-001"
+CACHED_API_URL = f"https://generativelanguage.googleapis.com/v1beta/{CACHED_MODEL}:generateContent"
+CACHED_CONTENTS_URL = "https://generativelanguage.googleapis.com/v1beta/cachedContents"
+CONTEXT_CACHE_TTL = "3600s"
+# cachedContents rejects prefixes below this size for the model
+CONTEXT_CACHE_MIN_TOKENS = 4096
+# Server-Sent Events variants of the two generateContent endpoints
+STREAM_API_URL = API_URL.replace(":generateContent", ":streamGenerateContent")
+CACHED_STREAM_API_URL = CACHED_API_URL.replace(":generateContent", ":streamGenerateContent")
+REQUEST_TIMEOUT = (3.05, 30)  # (connect, read) seconds
+
+# One pooled session so repeat calls reuse the TCP/TLS connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=2, backoff_factor=0.3)
+))
+
+def _json_dumps(obj):
+    """
+    Serialize a request body to bytes, with orjson when it's available.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+def _json_loads(data):
+    """
+    Parse a JSON response body (bytes or str), with orjson when it's available.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# 4. Response cache (exact prompt match, persisted across runs)
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".josi_cache")
+CACHE_TTL = 60 * 60  # seconds
+QUESTION_CACHE_TTL = 7 * 24 * 60 * 60  # generated questions per role
+CACHE_MAXSIZE = 512  # entries kept in memory (least recently used evicted)
+
+_response_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_db = None
+
+def _cache_key(prompt):
+    return hashlib.blake2b(prompt.encode("utf-8")).hexdigest()
+
+def _open_cache_db():
+    """
+    Lazily open the shelve file backing the cache.
+    If it can't be opened we just keep the in-memory cache.
+    """
+    global _cache_db
+    if _cache_db is None:
+        try:
+            _cache_db = shelve.open(CACHE_PATH)
+            _prune_cache_db(_cache_db)
+        except Exception as e:
+            print("DEBUG – Could not open response cache:", e)
+            _cache_db = {}
+    return _cache_db
+
+def _prune_cache_db(db):
+    """
+    Drop entries older than the longest TTL so the file doesn't grow forever.
+    """
+    cutoff = time.time() - max(CACHE_TTL, QUESTION_CACHE_TTL)
+    stale = [key for key in db.keys() if db[key][0] < cutoff]
+    for key in stale:
+        del db[key]
+    if stale:
+        db.sync()
+
+def _remember_entry(key, entry):
+    _response_cache[key] = entry
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > CACHE_MAXSIZE:
+        _response_cache.popitem(last=False)
+
+def _cache_get(key, ttl=CACHE_TTL):
+    with _cache_lock:
+        entry = _response_cache.get(key)
+        if entry is None:
+            entry = _open_cache_db().get(key)
+        if entry is None:
+            return None
+        ts, text = entry
+        if time.time() - ts > ttl:
+            _response_cache.pop(key, None)
+            db = _open_cache_db()
+            if key in db:
+                del db[key]
+            return None
+        _remember_entry(key, entry)
+        return text
+
+def _cache_put(key, text):
+    with _cache_lock:
+        entry = (time.time(), text)
+        _remember_entry(key, entry)
+        db = _open_cache_db()
+        db[key] = entry
+        if hasattr(db, "sync"):
+            db.sync()
+
+def _is_time_sensitive(prompt):
+    """
+    Prompts that mention the current date/time should never be served from cache.
+    """
+    now = datetime.now()
+    return now.strftime("%H:%M") in prompt or now.strftime("%Y-%m-%d") in prompt
+
+def is_cacheable_prefix(text):
+    """
+    Rough check (~4 characters per token) that text is big enough to cache.
+    """
+    return len(text) // 4 >= CONTEXT_CACHE_MIN_TOKENS
+
+def create_context_cache(text):
+    """
+    Registers text with Gemini's cachedContents API as a system instruction.
+    Returns the cache name (e.g. "cachedContents/abc") or None on failure,
+    including when text is too small to be cached at all.
+    """
+    if not is_cacheable_prefix(text):
+        return None
+    headers = {'Content-Type': 'application/json'}
+    data = {
+        "model": CACHED_MODEL,
+        "systemInstruction": {
+            "parts": [{
+                "text": text
+            }]
+        },
+        "ttl": CONTEXT_CACHE_TTL
+    }
+    try:
+        url = f"{CACHED_CONTENTS_URL}?key={get_api_key()}"
+        resp = _SESSION.post(url, headers=headers, data=_json_dumps(data), timeout=REQUEST_TIMEOUT)
+        if resp.status_code == 200:
+            return _json_loads(resp.content)['name']
+        print("DEBUG – Context cache not created:", resp.status_code, resp.text)
+    except Exception as e:
+        print("DEBUG – Context cache error:", e)
+    return None
+
+def call_gemini_api(prompt, no_cache=False, cached_content=None):
     """
     Makes a POST request to Gemini with the given prompt.
     Returns the text response or an error message if any.
+
+    Successful responses are cached by exact prompt for CACHE_TTL seconds;
+    pass no_cache=True to always hit the API.
+    If cached_content is given, the request references that cached prefix.
     """
+    use_cache = not no_cache and not _is_time_sensitive(prompt)
+    key = _cache_key(prompt)
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
     headers = {'Content-Type': 'application/json'}
     data = {
         "contents": [{
@@ -90,19 +296,522 @@ def call_gemini_api(prompt):
             }]
         }]
     }
-    url = f"{API_URL}?key={API_KEY}"
+    base_url = API_URL
+    if cached_content:
+        data["cachedContent"] = cached_content
+        base_url = CACHED_API_URL
     try:
-        resp = requests.post(url, headers=headers, json=data)
+        url = f"{base_url}?key={get_api_key()}"
+        resp = _SESSION.post(url, headers=headers, data=_json_dumps(data), timeout=REQUEST_TIMEOUT)
         if resp.status_code == 200:
             # Typical structure from Gemini
-            return resp.json()['candidates'][0]['content']['parts'][0]['text']
+            text = _json_loads(resp.content)['candidates'][0]['content']['parts'][0]['text']
+            if use_cache:
+                _cache_put(key, text)
+            return text
         else:
             return f"Error {resp.status_code}: {resp.text}"
     except Exception as e:
         return f"Error: {str(e)}"
 
+# Semantic cache: serve near-duplicate chat prompts from a local vector lookup
+SEMANTIC_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".josi_semantic.db")
+SEMANTIC_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_THRESHOLD = 0.92
+# Composite questions: combine entries above SINGLE whose scores sum past COMBINED
+SEMANTIC_SINGLE_THRESHOLD = 0.55
+SEMANTIC_COMBINED_THRESHOLD = 1.2
+SEMANTIC_TTL = 24 * 60 * 60  # seconds
+# Follow-ups like "tell me more" or "why?" only make sense with the history,
+# so they're never matched against (or stored in) the semantic cache
+SEMANTIC_MIN_WORDS = 4
+FOLLOW_UP_WORDS = {
+    "it", "its", "that", "this", "those", "these", "they", "them", "he", "she",
+    "more", "why", "also", "else", "above", "previous", "again", "another"
+}
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def get_embedder():
+    """
+    Load the sentence embedding model once. Returns None if it's unavailable.
+    """
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+                _embedder = SentenceTransformer(SEMANTIC_MODEL)
+            except Exception as e:
+                print("DEBUG – Could not load embedding model:", e)
+                _embedder = False
+    return _embedder or None
+
+def embed_text(text):
+    """
+    Returns a normalized float32 embedding for text, or None.
+    """
+    model = get_embedder()
+    if model is None:
+        return None
+    return np.asarray(model.encode(text, normalize_embeddings=True), dtype=np.float32)
+
+def _numpy_cosine_scores(matrix, query):
+    """
+    Cosine similarity of query (D,) against every row of matrix (N, D).
+    """
+    denom = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    denom[denom == 0] = 1.0
+    return (matrix @ query) / denom
+
+def _numba_cosine_scores(matrix, query):
+    """
+    Loop version of _numpy_cosine_scores for numba to compile (see warm_cosine_scores).
+    """
+    n, d = matrix.shape
+    q_norm = 0.0
+    for j in range(d):
+        q_norm += query[j] * query[j]
+    q_norm = np.sqrt(q_norm)
+    out = np.empty(n, dtype=np.float32)
+    for i in numba.prange(n):
+        dot = 0.0
+        m_norm = 0.0
+        for j in range(d):
+            dot += matrix[i, j] * query[j]
+            m_norm += matrix[i, j] * matrix[i, j]
+        denom = np.sqrt(m_norm) * q_norm
+        out[i] = dot / denom if denom > 0.0 else 0.0
+    return out
+
+_cosine_kernel = _numpy_cosine_scores
+
+def cosine_scores(matrix, query):
+    return _cosine_kernel(matrix, query)
+
+def warm_cosine_scores():
+    """
+    Import numba and compile the kernel once, then swap it in for numpy.
+    Without numba the numpy version stays in use.
+    """
+    global numba, _cosine_kernel
+    try:
+        import numba as numba_module
+    except ImportError:
+        return
+    numba = numba_module
+    kernel = numba.njit(cache=True, fastmath=True, parallel=True)(_numba_cosine_scores)
+    kernel(np.zeros((2, 8), dtype=np.float32), np.ones(8, dtype=np.float32))
+    _cosine_kernel = kernel
+
+def is_follow_up(prompt):
+    """
+    True if prompt is too short or refers back to earlier turns.
+    """
+    words = re.findall(r"[a-z']+", prompt.lower())
+    return len(words) < SEMANTIC_MIN_WORDS or any(w in FOLLOW_UP_WORDS for w in words)
+
+def system_prompt_namespace():
+    """
+    Cache namespace tied to the system prompt, so cached answers stop being
+    served as soon as COLLEGE_INFO changes.
+    """
+    return hashlib.blake2b(get_system_prompt().encode("utf-8"), digest_size=8).hexdigest()
+
+class SemanticCache:
+    """
+    Stores {prompt, response, ts} rows with their embeddings in SQLite,
+    under a namespace (one per system prompt, see system_prompt_namespace),
+    so answers survive restarts until they expire. lookup() returns the cached response of the
+    most similar prompt if its cosine similarity clears the threshold,
+    or a composition of several related answers for multi-part questions.
+    """
+    def __init__(self, namespace, path=SEMANTIC_CACHE_PATH,
+                 threshold=SEMANTIC_THRESHOLD, ttl=SEMANTIC_TTL,
+                 single_threshold=SEMANTIC_SINGLE_THRESHOLD,
+                 combined_threshold=SEMANTIC_COMBINED_THRESHOLD):
+        self.namespace = namespace
+        self.threshold = threshold
+        self.single_threshold = single_threshold
+        self.combined_threshold = combined_threshold
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.prompts = []
+        self.responses = []
+        self.timestamps = []
+        self.embeddings = None  # contiguous float32 (N, D) matrix
+        self.conn = None
+        if np is None or importlib.util.find_spec("sentence_transformers") is None:
+            return
+        try:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS semantic_cache ("
+                "session TEXT, prompt TEXT, response TEXT, ts REAL, embedding BLOB)"
+            )
+            self.conn.execute("DELETE FROM semantic_cache WHERE ts < ?", (time.time() - ttl,))
+            self.conn.commit()
+            self._load()
+        except Exception as e:
+            print("DEBUG – Could not open semantic cache:", e)
+            self.conn = None
+
+    def _load(self):
+        rows = self.conn.execute(
+            "SELECT prompt, response, ts, embedding FROM semantic_cache WHERE session = ?",
+            (self.namespace,)
+        )
+        vectors = []
+        for prompt, response, ts, blob in rows:
+            self.prompts.append(prompt)
+            self.responses.append(response)
+            self.timestamps.append(ts)
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+        if vectors:
+            self.embeddings = np.ascontiguousarray(np.stack(vectors))
+
+    def lookup(self, prompt):
+        if self.conn is None or not _EMBEDDER_READY.is_set():
+            return None
+        query = embed_text(prompt)
+        if query is None:
+            return None
+        with self.lock:
+            if self.embeddings is None:
+                return None
+            scores = cosine_scores(self.embeddings, query)
+            expired = np.asarray(self.timestamps) < time.time() - self.ttl
+            scores[expired] = -1.0
+            best = int(np.argmax(scores))
+            print("DEBUG – Semantic cache best score:", float(scores[best]))
+            if scores[best] >= self.threshold:
+                return self.responses[best]
+
+            # Generative cache: stitch several partial matches together
+            candidates = np.flatnonzero(scores > self.single_threshold)
+            candidates = candidates[np.argsort(-scores[candidates])]
+            # Skip paraphrases of a question we've already picked
+            chosen = []
+            for i in candidates:
+                if chosen and cosine_scores(self.embeddings[chosen], self.embeddings[i]).max() >= self.threshold:
+                    continue
+                chosen.append(int(i))
+            if len(chosen) < 2 or scores[chosen].sum() <= self.combined_threshold:
+                return None
+            return "\n\n".join(
+                f"### {self.prompts[i]}\n{self.responses[i]}" for i in chosen
+            )
+
+    def add(self, prompt, response):
+        if self.conn is None or not _EMBEDDER_READY.is_set():
+            return
+        vec = embed_text(prompt)
+        if vec is None:
+            return
+        ts = time.time()
+        with self.lock:
+            self.prompts.append(prompt)
+            self.responses.append(response)
+            self.timestamps.append(ts)
+            if self.embeddings is None:
+                self.embeddings = vec[np.newaxis, :].copy()
+            else:
+                self.embeddings = np.vstack((self.embeddings, vec))
+            self.conn.execute(
+                "INSERT INTO semantic_cache VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, prompt, response, ts, vec.tobytes())
+            )
+            self.conn.commit()
+
+# Fan-out limits: at most ASYNC_CONCURRENCY requests in flight, and
+# rate-limit/server errors are retried with the same backoff as _SESSION
+ASYNC_CONCURRENCY = 4
+ASYNC_RETRIES = 2
+ASYNC_BACKOFF = 0.3  # seconds, doubled on each retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+async def _call_gemini_async(prompt, client):
+    """
+    Async counterpart of call_gemini_api (uncached).
+    client is an httpx.AsyncClient, or None to run the sync call in a thread.
+    """
+    if client is None:
+        return await asyncio.to_thread(call_gemini_api, prompt, True)
+
+    data = {
+        "contents": [{
+            "parts": [{
+                "text": prompt
+            }]
+        }]
+    }
+    result = "Error: no response"
+    for attempt in range(ASYNC_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(ASYNC_BACKOFF * 2 ** (attempt - 1))
+        try:
+            url = f"{API_URL}?key={get_api_key()}"
+            resp = await client.post(
+                url,
+                headers={'Content-Type': 'application/json'},
+                content=_json_dumps(data)
+            )
+            if resp.status_code == 200:
+                return _json_loads(resp.content)['candidates'][0]['content']['parts'][0]['text']
+            result = f"Error {resp.status_code}: {resp.text}"
+            if resp.status_code not in RETRY_STATUSES:
+                break
+        except httpx.TransportError as e:
+            result = f"Error: {str(e)}"
+        except Exception as e:
+            return f"Error: {str(e)}"
+    return result
+
+def _new_async_client():
+    if httpx is None:
+        return None
+    try:
+        return httpx.AsyncClient(http2=True, timeout=REQUEST_TIMEOUT[1])
+    except ImportError:
+        # http2=True needs the 'h2' package
+        return httpx.AsyncClient(timeout=REQUEST_TIMEOUT[1])
+
+async def call_gemini_many(prompts):
+    """
+    Send independent prompts concurrently; results come back in order.
+    """
+    client = _new_async_client()
+    semaphore = asyncio.Semaphore(ASYNC_CONCURRENCY)
+
+    async def limited(prompt):
+        async with semaphore:
+            return await _call_gemini_async(prompt, client)
+
+    try:
+        return await asyncio.gather(*[limited(p) for p in prompts])
+    finally:
+        if client is not None:
+            await client.aclose()
+
+# Profanity scanning: the censor wordlist compiled into one regex/DFA
+PROFANITY_DB_DIR = os.path.expanduser("~")
+
+# better_profanity treats letters, digits and these as part of a word;
+# anything else (spaces, punctuation, '_') separates words
+_PROFANITY_WORD_EXTRAS = "@$*\"'"
+
+def _profanity_pattern(engine="re"):
+    """
+    One alternation over the censor wordlist, with each letter expanded
+    into better_profanity's leetspeak character class (e.g. a -> [a@*4]).
+
+    Matches must start and end on a word boundary as better_profanity
+    tokenizes. \\b isn't enough since leetspeak characters like '@' and
+    '$' aren't regex word characters. The stdlib re version uses
+    lookarounds; "re2" and "hyperscan" don't support them, so their
+    variants consume the separator (or ^/$) instead. Hyperscan scans
+    UTF-8 bytes, so any non-ASCII byte is treated as part of a word.
+    """
+    mapping = getattr(profanity, "CHARS_MAPPING", {})
+
+    def variants(word):
+        parts = []
+        for ch in word:
+            subs = mapping.get(ch)
+            if subs:
+                parts.append("[" + "".join(re.escape(c) for c in subs) + "]")
+            else:
+                parts.append(re.escape(ch))
+        return "".join(parts)
+
+    words = sorted({str(w).lower() for w in profanity.CENSOR_WORDSET}, key=len, reverse=True)
+    alternation = "(?:" + "|".join(variants(w) for w in words) + ")"
+    extras = re.escape(_PROFANITY_WORD_EXTRAS)
+    if engine == "hyperscan":
+        sep = f"[^A-Za-z0-9{extras}\\x80-\\xff]"
+        return f"(?:^|{sep}){alternation}(?:$|{sep})"
+    if engine == "re2":
+        sep = f"[^\\pL\\pN{extras}]"
+        return f"(?:^|{sep}){alternation}(?:$|{sep})"
+    word_char = f"[^\\W_]|[{extras}]"
+    return f"(?<!{word_char}){alternation}(?!{word_char})"
+
+def _hyperscan_matcher(hyperscan, pattern):
+    digest = hashlib.blake2b(pattern.encode("utf-8"), digest_size=8).hexdigest()
+    path = os.path.join(PROFANITY_DB_DIR, f".josi_profanity_{digest}.hsdb")
+    db = None
+    try:
+        with open(path, "rb") as f:
+            db = hyperscan.loadb(f.read())
+    except Exception:
+        pass
+    if db is None:
+        db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        db.compile(
+            expressions=[pattern.encode("utf-8")],
+            flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH]
+        )
+        try:
+            with open(path, "wb") as f:
+                f.write(hyperscan.dumpb(db))
+        except OSError as e:
+            print("DEBUG – Could not save profanity DB:", e)
+
+    def matcher(text):
+        found = []
+
+        def on_match(*args):
+            found.append(True)
+            return True  # stop scanning at the first hit
+
+        db.scan(text.encode("utf-8"), match_event_handler=on_match)
+        return bool(found)
+    return matcher
+
+def build_profanity_matcher():
+    """
+    Returns a text -> bool matcher using Hyperscan, RE2 or re, in that order.
+    """
+    try:
+        import hyperscan
+        return _hyperscan_matcher(hyperscan, _profanity_pattern("hyperscan"))
+    except ImportError:
+        pass
+    except Exception as e:
+        print("DEBUG – Hyperscan compile failed:", e)
+    try:
+        import re2
+    except ImportError:
+        re2 = None
+    if re2 is not None:
+        try:
+            compiled = re2.compile("(?i)" + _profanity_pattern("re2"))
+            return lambda text: compiled.search(text) is not None
+        except Exception as e:
+            print("DEBUG – RE2 compile failed:", e)
+    compiled = re.compile(_profanity_pattern(), re.IGNORECASE)
+    return lambda text: compiled.search(text) is not None
+
+_profanity_matcher = None
+_profanity_lock = threading.Lock()
+
+def get_profanity_matcher():
+    """
+    Load the censor words and compile the matcher on first use.
+    """
+    global _profanity_matcher
+    with _profanity_lock:
+        if _profanity_matcher is None:
+            profanity.load_censor_words()
+            _profanity_matcher = build_profanity_matcher()
+    return _profanity_matcher
+
+class GeminiStreamError(Exception):
+    """
+    A streamed request failed, possibly after some text was already yielded.
+    str(e) is the same "Error ..." message call_gemini_api would return.
+    """
+
+def stream_gemini_api(prompt, cached_content=None):
+    """
+    Like call_gemini_api, but yields the response text in chunks as Gemini
+    generates it (streamGenerateContent over Server-Sent Events).
+    Failures raise GeminiStreamError instead of being yielded as text.
+    Only a complete response is stored in the exact-match cache, and a
+    cached response is yielded in one piece.
+    """
+    use_cache = not _is_time_sensitive(prompt)
+    key = _cache_key(prompt)
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    headers = {'Content-Type': 'application/json'}
+    data = {
+        "contents": [{
+            "parts": [{
+                "text": prompt
+            }]
+        }]
+    }
+    base_url = STREAM_API_URL
+    if cached_content:
+        data["cachedContent"] = cached_content
+        base_url = CACHED_STREAM_API_URL
+
+    parts = []
+    block_reason = finish_reason = None
+    try:
+        url = f"{base_url}?alt=sse&key={get_api_key()}"
+        with _SESSION.post(url, headers=headers, data=_json_dumps(data), timeout=REQUEST_TIMEOUT, stream=True) as resp:
+            if resp.status_code != 200:
+                raise GeminiStreamError(f"Error {resp.status_code}: {resp.text}")
+            resp.encoding = "utf-8"
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                chunk = _json_loads(line[len("data:"):])
+                if 'error' in chunk:
+                    error = chunk['error']
+                    raise GeminiStreamError(f"Error {error.get('code', '')}: {error.get('message', error)}")
+                # The final chunk may carry only a finishReason (or a safety
+                # block) and no content
+                block_reason = (chunk.get('promptFeedback') or {}).get('blockReason', block_reason)
+                candidates = chunk.get('candidates') or [{}]
+                finish_reason = candidates[0].get('finishReason', finish_reason)
+                content = candidates[0].get('content') or {}
+                text = "".join(part.get('text', '') for part in content.get('parts', []))
+                if text:
+                    parts.append(text)
+                    yield text
+    except GeminiStreamError:
+        raise
+    except Exception as e:
+        raise GeminiStreamError(f"Error: {str(e)}") from e
+
+    if not parts:
+        raise GeminiStreamError(
+            f"Error: empty reply (blockReason={block_reason}, finishReason={finish_reason})"
+        )
+    if use_cache:
+        _cache_put(key, "".join(parts))
+
+# Heavy one-off setup (profanity DB, embedding model, numba JIT) runs in the
+# background at startup. Each resource has its own ready flag, and until
+# it's set callers use the cheap fallback (better_profanity / no semantic cache).
+_PROFANITY_READY = threading.Event()
+_EMBEDDER_READY = threading.Event()
+
+def warm_caches():
+    try:
+        get_profanity_matcher()
+    except Exception as e:
+        print("DEBUG – Profanity matcher warm-up failed:", e)
+    finally:
+        _PROFANITY_READY.set()
+
+    if np is None:
+        return
+    try:
+        warm_cosine_scores()
+    except Exception as e:
+        print("DEBUG – Similarity kernel warm-up failed:", e)
+    try:
+        # May download the model on first run, so it goes last
+        if importlib.util.find_spec("sentence_transformers") is not None:
+            get_embedder()
+    except Exception as e:
+        print("DEBUG – Embedding model warm-up failed:", e)
+    finally:
+        _EMBEDDER_READY.set()
+
 def contains_profanity(text):
-    return profanity.contains_profanity(text)
+    if not _PROFANITY_READY.is_set():
+        return profanity.contains_profanity(text)
+    return get_profanity_matcher()(text)
 
 def gemini_check_company(company_name):
     """
@@ -132,62 +841,106 @@ IMPORTANT: No extra text or explanation.
         return True
     return False
 
-def gemini_generate_questions(role):
+def _extract_json_object(raw_response):
+    """
+    Parse the first JSON object in raw_response, ignoring any text around it.
+    raw_decode stops at the balanced closing brace, so braces inside strings
+    or trailing commentary don't break the parse.
+    """
+    start_idx = raw_response.find('{')
+    if start_idx == -1:
+        raise ValueError("No JSON object in response.")
+    json_str = raw_response[start_idx:].strip()
+    if orjson is not None:
+        try:
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            pass  # trailing text after the object; fall through to raw_decode
+    data, _ = json.JSONDecoder().raw_decode(json_str)
+    return data
+
+DEFAULT_TECHNICAL_QUESTIONS = [
+    "Explain what OOP is.",
+    "What is a database index?",
+    "How does a binary search work?",
+    "What is an API, and how do you use it?",
+    "Describe how you would optimize a slow SQL query."
+]
+DEFAULT_BEHAVIORAL_QUESTIONS = [
+    "Tell me about a challenge you overcame in a team.",
+    "How do you handle tight deadlines?",
+    "Describe a time you received critical feedback.",
+    "What does work-life balance mean to you?",
+    "What motivates you to succeed?"
+]
+
+def _generate_question_list(prompt, key, fallback):
+    """
+    Ask Gemini for a JSON object holding exactly 5 questions under key.
+    Falls back to a copy of the default list on any parse error or mismatch.
+    """
+    raw_response = call_gemini_api(prompt)
+    print(f"DEBUG – Generate {key} raw response:", repr(raw_response))  # Debug print
+
+    # Attempt parse
+    try:
+        data = _extract_json_object(raw_response)
+        questions = data[key]
+        # Basic validations:
+        if len(questions) != 5:
+            raise ValueError(f"Did not receive exactly 5 {key}.")
+    except Exception as e:
+        print("DEBUG – JSON parse error or mismatch:", e)
+        print("DEBUG – Falling back to default questions.")
+        questions = list(fallback)
+    return questions
+
+def gemini_generate_technical_questions(role):
     """
-    Dynamically generate exactly 5 technical and 5 behavioral interview questions
+    Dynamically generate exactly 5 technical interview questions
     relevant to the given 'role'.
     If role is IT/software related, we want at least 1-2 coding questions.
-    
-    We prompt Gemini to return pure JSON with exactly two keys:
-      "technical_questions": [...],
-      "behavioral_questions": [...]
+
+    Results are cached per normalized role for QUESTION_CACHE_TTL, so repeat
+    attempts for the same role skip the generation call.
     """
+    key = _cache_key("technical_questions:" + role.strip().lower())
+    cached = _cache_get(key, ttl=QUESTION_CACHE_TTL)
+    if cached is not None:
+        return list(cached)
+
     prompt = f"""
-Generate exactly 5 technical interview questions and 5 behavioral interview questions
+Generate exactly 5 technical interview questions
 for the role: "{role}" at St. Xavier's College campus placements.
 - If the role is IT/software related, include at least 2 coding or programming questions.
-Return ONLY valid JSON, with keys:
-  "technical_questions": <array of 5 strings>,
+Return ONLY valid JSON, with the key:
+  "technical_questions": <array of 5 strings>.
+No code fences, no extra commentary.
+"""
+    questions = _generate_question_list(prompt, "technical_questions", DEFAULT_TECHNICAL_QUESTIONS)
+    # Don't pin the fallback list to this role
+    if questions != DEFAULT_TECHNICAL_QUESTIONS:
+        _cache_put(key, questions)
+    return questions
+
+def gemini_generate_behavioral_questions(company):
+    """
+    Dynamically generate exactly 5 behavioral interview questions for 'company'.
+    These don't depend on the role, so they can be fetched before the user
+    has typed it (see TestManager.prefetch_behavioral_questions).
+    """
+    prompt = f"""
+Generate exactly 5 behavioral interview questions for a candidate interviewing
+with "{company}" at St. Xavier's College campus placements.
+Return ONLY valid JSON, with the key:
   "behavioral_questions": <array of 5 strings>.
 No code fences, no extra commentary.
 """
-    raw_response = call_gemini_api(prompt)
-    print("DEBUG – Generate questions raw response:", repr(raw_response))  # Debug print
-    
-    # We'll try to extract the portion from the first '{' to the last '}' as naive JSON capture.
-    start_idx = raw_response.find('{')
-    end_idx = raw_response.rfind('}')
-    json_str = ""
-    
-    if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-        json_str = raw_response[start_idx:end_idx+1].strip()
-    
-    # Attempt parse
-    try:
-        data = json.loads(json_str)
-        tech = data["technical_questions"]
-        beh = data["behavioral_questions"]
-        # Basic validations:
-        if len(tech) != 5 or len(beh) != 5:
-            raise ValueError("Did not receive exactly 5 technical and 5 behavioral questions.")
-    except Exception as e:
-        print("DEBUG – JSON parse error or mismatch:", e)
-        print("DEBUG – Falling back to default questions.")
-        tech = [
-            "Explain what OOP is.",
-            "What is a database index?",
-            "How does a binary search work?",
-            "What is an API, and how do you use it?",
-            "Describe how you would optimize a slow SQL query."
-        ]
-        beh = [
-            "Tell me about a challenge you overcame in a team.",
-            "How do you handle tight deadlines?",
-            "Describe a time you received critical feedback.",
-            "What does work-life balance mean to you?",
-            "What motivates you to succeed?"
-        ]
-    return tech, beh
+    return _generate_question_list(prompt, "behavioral_questions", DEFAULT_BEHAVIORAL_QUESTIONS)
+
+# Background generation while the user is still typing
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=2)
+PREFETCH_TIMEOUT = 30  # seconds
 
 
 # 5. Test Manager (One-by-one Q&A)
@@ -202,6 +955,22 @@ class TestManager:
             'behavioral_questions': [],
             'user_answers': []
         }
+        self.behavioral_future = None
+
+    def reset(self):
+        """
+        Clear the current test in place so the manager can be reused.
+        """
+        self.in_test = False
+        self.question_index = 0
+        self.test_data['company'] = ''
+        self.test_data['role'] = ''
+        self.test_data['technical_questions'] = []
+        self.test_data['behavioral_questions'] = []
+        self.test_data['user_answers'] = []
+        if self.behavioral_future is not None:
+            self.behavioral_future.cancel()
+            self.behavioral_future = None
 
     def set_company(self, name):
         """
@@ -212,11 +981,30 @@ class TestManager:
     def set_role(self, role):
         self.test_data['role'] = role
 
+    def prefetch_behavioral_questions(self):
+        """
+        Start generating the behavioral Qs for the chosen company in the
+        background, while the user is still entering their role.
+        """
+        self.behavioral_future = _PREFETCH_POOL.submit(
+            gemini_generate_behavioral_questions, self.test_data['company']
+        )
+
     def generate_test_questions(self):
         """
         Dynamically fetch Qs from Gemini or fallback.
+        Technical Qs need the role; behavioral Qs come from the prefetch.
         """
-        tech, beh = gemini_generate_questions(self.test_data['role'])
+        if self.behavioral_future is None:
+            self.prefetch_behavioral_questions()
+        future = self.behavioral_future
+        tech = gemini_generate_technical_questions(self.test_data['role'])
+        try:
+            beh = future.result(timeout=PREFETCH_TIMEOUT)
+        except Exception as e:
+            print("DEBUG – Behavioral prefetch failed:", e)
+            beh = list(DEFAULT_BEHAVIORAL_QUESTIONS)
+        self.behavioral_future = None
         self.test_data['technical_questions'] = tech
         self.test_data['behavioral_questions'] = beh
 
@@ -245,21 +1033,59 @@ class TestManager:
     def evaluate_answers(self):
         """
         Evaluate the user's answers with Gemini. 
-        Provide feedback + a final (0-100%) 'placement probability'.
-        """
-        prompt = f"""
-Evaluate these interview answers for {self.test_data['company']} ({self.test_data['role']}):
-Technical Questions:
-{self.test_data['technical_questions']}
-Behavioral Questions:
-{self.test_data['behavioral_questions']}
-Answers:
-{self.test_data['user_answers']}
-
-Give detailed feedback for each answer and a final (0-100%) 'placement probability'.
+        Each answer is scored by its own request (sent concurrently),
+        then one small call turns the feedback into a final (0-100%)
+        'placement probability'. Answers whose request failed are left out
+        of the summary; if most failed, a single "Error ..." is returned.
+        """
+        company = self.test_data['company']
+        role = self.test_data['role']
+        questions = self.test_data['technical_questions'] + self.test_data['behavioral_questions']
+        answers = self.test_data['user_answers']
+
+        prompts = [
+            f"""
+Evaluate this interview answer for {company} ({role}):
+Question: {q}
+Answer: {a}
+
+Give short, detailed feedback on the answer and a score out of 10.
 """
-        result = call_gemini_api(prompt)
-        return result
+            for q, a in zip(questions, answers)
+        ]
+        # We're already on a worker thread, so run a private event loop here
+        feedback = asyncio.run(call_gemini_many(prompts))
+
+        failed = [fb for fb in feedback if fb.startswith("Error")]
+        if len(failed) * 2 > len(feedback):
+            print("DEBUG – Evaluation errors:", failed)
+            return (
+                f"Error: could not evaluate {len(failed)} of {len(feedback)} answers. "
+                f"{failed[0][:200]}"
+            )
+
+        sections = [
+            f"### Q{i}: {q}\n{fb}"
+            for i, (q, fb) in enumerate(zip(questions, feedback), start=1)
+            if not fb.startswith("Error")
+        ]
+        report = "\n\n".join(
+            f"### Q{i}: {q}\n"
+            + ("_Feedback unavailable for this answer._" if fb.startswith("Error") else fb)
+            for i, (q, fb) in enumerate(zip(questions, feedback), start=1)
+        )
+        summary_prompt = f"""
+Here is per-answer interview feedback for {company} ({role}):
+{chr(10).join(sections)}
+
+Summarize the candidate's overall performance in a few bullets and give a
+final (0-100%) 'placement probability'.
+"""
+        summary = call_gemini_api(summary_prompt, no_cache=True)
+        if summary.startswith("Error"):
+            print("DEBUG – Evaluation summary error:", summary)
+            summary = "_Overall summary unavailable._"
+        return f"{report}\n\n### Overall\n{summary}"
 
 
 # 6. Base Chatbot GUI
@@ -277,6 +1103,15 @@ COLORS = {
     "success": "#34d399"
 }
 
+# Markdown patterns used by format_markdown (compiled once)
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_CODE_RE = re.compile(r'`(.*?)`')
+_INLINE_RE = re.compile(f"{_BOLD_RE.pattern}|{_CODE_RE.pattern}")
+_BULLET_RE = re.compile(r'^\s*•')
+
+UI_PUMP_MS = 16      # ~60 Hz
+UI_PUMP_BATCH = 200  # max queued updates applied per tick
+
 class ChatbotGUI(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -296,7 +1131,16 @@ class ChatbotGUI(ctk.CTk):
         self.create_chat_container()
         self.create_input_area()
 
-        self.is_processing = False
+        # Load models/DBs off the UI thread so the window paints immediately
+        threading.Thread(target=warm_caches, daemon=True).start()
+
+        # Set while a user turn is being handled
+        self._processing = threading.Event()
+        # Worker threads post (method_name, args) here; _pump applies them
+        self._ui_queue = queue.Queue()
+        self._pump_id = self.after(UI_PUMP_MS, self._pump)
+        # Reused worker threads for Gemini calls (one job per user turn)
+        self._pool = ThreadPoolExecutor(max_workers=2)
         self.setup_tags()
 
         # Welcome text with disclaimers
@@ -381,55 +1225,54 @@ class ChatbotGUI(ctk.CTk):
 
     def format_markdown(self, text):
         """
-        Simple parser for headings (###), bold (**...**),
+        Simple parser for headings (###), bold (**...**), inline code (`...`)
         and bullet lines (starting with '•').
+        Builds a list of (text, tag) segments first, then inserts them with
+        one insert per run of same-tagged text.
         """
-        lines = text.split('\n')
-        leftover = ""
+        segments = []
 
-        for line in lines:
+        for line in text.split('\n'):
             # Headings
             if line.startswith('###'):
                 heading_text = line.strip('#').strip()
-                self.chat_display.insert("end", heading_text + "\n", "heading")
+                segments.append((heading_text + "\n", "heading"))
                 continue
 
             # Bullets
-            if line.strip().startswith('•'):
-                self.chat_display.insert("end", "  ", "message")
-                self.chat_display.insert("end", "• ", "bullet")
+            if _BULLET_RE.match(line):
                 bullet_text = line.strip('• ').strip()
-                self.chat_display.insert("end", bullet_text + "\n", "message")
+                segments.append(("  ", "message"))
+                segments.append(("• ", "bullet"))
+                segments.append((bullet_text + "\n", "message"))
                 continue
 
-            # Look for bold or code in the line
-            while '**' in line or '`' in line:
-                bold_match = re.search(r'\*\*(.*?)\*\*', line)
-                if bold_match:
-                    start, end = bold_match.span()
-                    leftover += line[:start]
-                    self.chat_display.insert("end", leftover, "message")
-                    self.chat_display.insert("end", bold_match.group(1), "bold")
-                    line = line[end:]
-                    leftover = ""
-                    continue
-
-                code_match = re.search(r'`(.*?)`', line)
-                if code_match:
-                    start, end = code_match.span()
-                    leftover += line[:start]
-                    self.chat_display.insert("end", leftover, "message")
-                    self.chat_display.insert("end", code_match.group(1), "code")
-                    line = line[end:]
-                    leftover = ""
-                    continue
+            # Bold or code spans; unmatched markers are left as plain text
+            pos = 0
+            for match in _INLINE_RE.finditer(line):
+                start, end = match.span()
+                segments.append((line[pos:start], "message"))
+                if match.group(1) is not None:
+                    segments.append((match.group(1), "bold"))
+                else:
+                    segments.append((match.group(2), "code"))
+                pos = end
+            segments.append((line[pos:] + "\n", "message"))
+
+        # Merge neighbours with the same tag so Tk sees as few inserts as possible
+        merged = []
+        for segment, tag in segments:
+            if not segment:
+                continue
+            if merged and merged[-1][1] == tag:
+                merged[-1][0] += segment
+            else:
+                merged.append([segment, tag])
 
-            leftover += line + "\n"
-            self.chat_display.insert("end", leftover, "message")
-            leftover = ""
+        for segment, tag in merged:
+            self.chat_display.insert("end", segment, tag)
 
-    def add_message(self, sender, message, is_error=False):
-        self.chat_display.configure(state="normal")
+    def insert_header(self, sender):
         timestamp = datetime.now().strftime("%H:%M")
         self.chat_display.insert("end", f"[{timestamp}] ", "timestamp")
 
@@ -440,6 +1283,7 @@ class ChatbotGUI(ctk.CTk):
 
         self.chat_display.insert("end", "\n")
 
+    def insert_body(self, message, is_error=False):
         if is_error:
             self.chat_display.insert("end", message + "\n\n", "error")
         else:
@@ -447,6 +1291,37 @@ class ChatbotGUI(ctk.CTk):
 
         self.chat_display.see("end")
         self.chat_display.configure(state="disabled")
+        # Let Tk redraw once for the whole message
+        self.chat_display.update_idletasks()
+
+    def add_message(self, sender, message, is_error=False):
+        self.chat_display.configure(state="normal")
+        self.insert_header(sender)
+        self.insert_body(message, is_error)
+
+    def begin_stream(self, sender):
+        """
+        Start a message whose text arrives in chunks through append_token.
+        """
+        self.chat_display.configure(state="normal")
+        self.insert_header(sender)
+        self.chat_display.mark_set("stream_start", "end-1c")
+        self.chat_display.mark_gravity("stream_start", "left")
+        self.chat_display.configure(state="disabled")
+
+    def append_token(self, text):
+        self.chat_display.configure(state="normal")
+        self.chat_display.insert("end", text, "message")
+        self.chat_display.see("end")
+        self.chat_display.configure(state="disabled")
+
+    def end_stream(self, message, is_error=False):
+        """
+        Replace the raw streamed text with the fully formatted message.
+        """
+        self.chat_display.configure(state="normal")
+        self.chat_display.delete("stream_start", "end")
+        self.insert_body(message, is_error)
 
     def handle_return(self, event):
         # If user hits Enter without SHIFT, we treat it as "Send"
@@ -456,7 +1331,7 @@ class ChatbotGUI(ctk.CTk):
         return None
 
     def send_message(self):
-        if self.is_processing:
+        if self._processing.is_set():
             return
 
         user_text = self.input_field.get("1.0", "end-1c").strip()
@@ -466,12 +1341,19 @@ class ChatbotGUI(ctk.CTk):
         self.input_field.delete("1.0", "end")
         self.add_message("You", user_text)
 
-        self.is_processing = True
+        self._processing.set()
         self.input_field.configure(state="disabled")
         self.send_button.configure(state="disabled")
 
-        thread = threading.Thread(target=self.process_message, args=(user_text,))
-        thread.start()
+        self.run_in_worker(self.process_message, user_text)
+
+    def run_in_worker(self, func, *args):
+        """
+        Run func on the worker pool and re-enable input once it's done.
+        """
+        fut = self._pool.submit(func, *args)
+        fut.add_done_callback(lambda f: self.post_ui("enable_input"))
+        return fut
 
     def process_message(self, user_text):
         """
@@ -485,22 +1367,69 @@ class ChatbotGUI(ctk.CTk):
             response = f"Error: {str(e)}"
             is_error = True
 
-        self.after(0, self.add_message, "JoSi", response, is_error)
-        self.after(0, self.enable_input)
+        self.post_ui("add_message", "JoSi", response, is_error)
+
+    def post_ui(self, method_name, *args):
+        """
+        Queue a GUI update from a worker thread (Tk isn't thread-safe).
+        """
+        self._ui_queue.put((method_name, args))
+
+    def _pump(self):
+        """
+        Apply queued GUI updates about once per frame. Consecutive
+        append_token chunks are merged into a single insert.
+        """
+        tokens = []
+        try:
+            for _ in range(UI_PUMP_BATCH):
+                try:
+                    method_name, args = self._ui_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if method_name == "append_token":
+                    tokens.append(args[0])
+                    continue
+                if tokens:
+                    self.append_token("".join(tokens))
+                    tokens = []
+                getattr(self, method_name)(*args)
+            if tokens:
+                self.append_token("".join(tokens))
+        finally:
+            self._pump_id = self.after(UI_PUMP_MS, self._pump)
 
     def enable_input(self):
-        self.is_processing = False
+        self._processing.clear()
         self.input_field.configure(state="normal")
         self.send_button.configure(state="normal")
         self.input_field.focus()
 
+    def destroy(self):
+        if self._pump_id is not None:
+            self.after_cancel(self._pump_id)
+            self._pump_id = None
+        self._pool.shutdown(wait=False)
+        super().destroy()
+
 
 # 7. Enhanced Chatbot with Test + Real Model
+HISTORY_CONTEXT = 5   # turns sent to Gemini with each prompt
+
 class EnhancedChatbotGUI(ChatbotGUI):
     def __init__(self):
         super().__init__()
-        self.conversation_history = []
+        # Most recent turns, pre-formatted as "sender: text" prompt lines;
+        # older ones fall off automatically
+        self._formatted_history = deque(maxlen=HISTORY_CONTEXT)
         self.test_manager = TestManager()
+        self.semantic_cache = SemanticCache(namespace=system_prompt_namespace())
+        # Register the system prompt once so chat turns only send the delta.
+        # Today's prompt is below the cacheable minimum, so this is skipped
+        # until COLLEGE_INFO grows large enough.
+        self.system_cache = None
+        if is_cacheable_prefix(get_system_prompt()):
+            threading.Thread(target=self.refresh_system_cache, daemon=True).start()
         self.add_test_controls()
 
     def add_test_controls(self):
@@ -535,11 +1464,18 @@ class EnhancedChatbotGUI(ChatbotGUI):
         self.start_test_btn.configure(state='disabled')
 
     def exit_test(self):
-        self.test_manager = TestManager()
+        self.test_manager.reset()
         self.exit_test_btn.configure(state='disabled')
         self.start_test_btn.configure(state='normal')
         self.add_message("JoSi", "Exited test mode. How else can I help you?")
 
+    def enable_input(self):
+        super().enable_input()
+        if self.test_manager.in_test:
+            self.exit_test_btn.configure(state='normal')
+        else:
+            self.start_test_btn.configure(state='normal')
+
     def handle_test_flow(self, user_input):
         """
         Walk through company check -> role -> ask questions -> final evaluation.
@@ -550,21 +1486,23 @@ class EnhancedChatbotGUI(ChatbotGUI):
         if not tm.test_data['company']:
             valid = tm.set_company(user_input)
             if not valid:
-                self.add_message(
-                    "JoSi", 
+                self.post_ui(
+                    "add_message",
+                    "JoSi",
                     "That company is **NOT recognized** for campus placements (or the model isn't sure). "
                     "Please try another company name."
                 )
                 return
             # If recognized:
             tm.test_data['company'] = user_input
-            self.add_message("JoSi", f"Great! Now enter the role you're applying for at {user_input}:")
+            tm.prefetch_behavioral_questions()
+            self.post_ui("add_message", "JoSi", f"Great! Now enter the role you're applying for at {user_input}:")
 
         # Step 2: If we have the company but no role set:
         elif not tm.test_data['role']:
             tm.set_role(user_input)
             tm.generate_test_questions()
-            self.add_message("JoSi", "Excellent! Let's begin with the first question:")
+            self.post_ui("add_message", "JoSi", "Excellent! Let's begin with the first question:")
             self.ask_next_question()
 
         # Step 3: If both company and role are set, store the user's answer:
@@ -573,8 +1511,8 @@ class EnhancedChatbotGUI(ChatbotGUI):
             if tm.all_answers_collected():
                 # All 10 answers collected, do final evaluation
                 result = tm.evaluate_answers()
-                self.add_message("JoSi", result)
-                self.exit_test()
+                self.post_ui("add_message", "JoSi", result, result.startswith("Error"))
+                self.post_ui("exit_test")
             else:
                 self.ask_next_question()
 
@@ -583,35 +1521,86 @@ class EnhancedChatbotGUI(ChatbotGUI):
         if question is None:
             # If no more questions left, do final evaluation
             result = self.test_manager.evaluate_answers()
-            self.add_message("JoSi", result)
-            self.exit_test()
+            self.post_ui("add_message", "JoSi", result, result.startswith("Error"))
+            self.post_ui("exit_test")
         else:
-            self.add_message("JoSi", f"**Q{self.test_manager.question_index}:** {question}")
+            self.post_ui("add_message", "JoSi", f"**Q{self.test_manager.question_index}:** {question}")
 
-    def get_response(self, prompt):
+    def refresh_system_cache(self):
+        self.system_cache = create_context_cache(get_system_prompt())
+
+    def ask_gemini(self, context, cached_content=None, on_token=None):
+        """
+        call_gemini_api, or stream_gemini_api feeding on_token when given.
+        A failed stream returns an "Error ..." message, even if part of the
+        reply was already streamed; the partial text is discarded.
+        """
+        if on_token is None:
+            return call_gemini_api(context, cached_content=cached_content)
+        chunks = []
+        try:
+            for chunk in stream_gemini_api(context, cached_content=cached_content):
+                chunks.append(chunk)
+                on_token(chunk)
+        except GeminiStreamError as e:
+            if chunks:
+                return f"Error: reply was interrupted ({str(e).removeprefix('Error: ')})"
+            return str(e)
+        return "".join(chunks)
+
+    def call_with_system_prompt(self, context, on_token=None):
+        """
+        Send context to Gemini behind the system prompt, using the cached
+        prefix when available and re-registering it if it has expired.
+        """
+        if self.system_cache:
+            response = self.ask_gemini(context, self.system_cache, on_token)
+            if not response.startswith("Error 404"):
+                return response
+            self.refresh_system_cache()
+            if self.system_cache:
+                return self.ask_gemini(context, self.system_cache, on_token)
+        return self.ask_gemini(f"{get_system_prompt()}\n\n{context}", on_token=on_token)
+
+    def get_response(self, prompt, on_token=None):
         """
         Send the user's prompt + short conversation context to Gemini.
+        If on_token is given, the reply is streamed into it chunk by chunk;
+        the full text is returned either way.
         """
         # If user text has profanity, block:
         if contains_profanity(prompt):
             return "I'm sorry, but I cannot respond to that."
 
+        # Serve FAQ-style repeats from the semantic cache (never during a test,
+        # and not for follow-ups whose meaning depends on the conversation)
+        use_semantic = not self.test_manager.in_test and not is_follow_up(prompt)
+        if use_semantic:
+            cached = self.semantic_cache.lookup(prompt)
+            if cached is not None:
+                return cached
+
         # Build a short conversation context
-        last_msgs = "\n".join([
-            f"{msg['sender']}: {msg['text']}"
-            for msg in self.conversation_history[-5:]
-        ])
-        final_text = f"{SYSTEM_PROMPT}\n\n{last_msgs}\nUser: {prompt}"
+        last_msgs = "\n".join(self._formatted_history)
+        final_text = f"{last_msgs}\nUser: {prompt}"
         
-        response = call_gemini_api(final_text)
+        response = self.call_with_system_prompt(final_text, on_token)
         print("DEBUG – Normal chat raw response:", repr(response))  # Debug print
+        if use_semantic and response.strip() and not response.startswith("Error"):
+            self.semantic_cache.add(prompt, response)
         return response
 
+    def remember(self, sender, text):
+        """
+        Record a turn, formatting its prompt line once here rather than on every request.
+        """
+        self._formatted_history.append(f"{sender}: {text}")
+
     def send_message(self):
         """
         Overridden to handle normal conversation or test mode.
         """
-        if self.is_processing:
+        if self._processing.is_set():
             return
 
         user_text = self.input_field.get("1.0", "end-1c").strip()
@@ -628,41 +1617,47 @@ class EnhancedChatbotGUI(ChatbotGUI):
             return
 
         # Append user text to conversation
-        self.conversation_history.append({'sender': 'user', 'text': user_text})
+        self.remember('user', user_text)
 
-        self.is_processing = True
+        self._processing.set()
         self.input_field.configure(state="disabled")
         self.send_button.configure(state="disabled")
+        # The worker reuses self.test_manager, so it mustn't be reset mid-turn;
+        # a test message added now would also land inside the streamed reply
+        self.exit_test_btn.configure(state="disabled")
+        self.start_test_btn.configure(state="disabled")
 
         if self.test_manager.in_test:
             # If we are in test mode, handle test flow
-            thread = threading.Thread(target=self.process_test_message, args=(user_text,))
+            self.run_in_worker(self.process_test_message, user_text)
         else:
             # Otherwise do normal conversation
-            thread = threading.Thread(target=self.process_normal_message, args=(user_text,))
-        thread.start()
+            self.run_in_worker(self.process_normal_message, user_text)
 
     def process_test_message(self, user_text):
         try:
             self.handle_test_flow(user_text)
         except Exception as e:
-            self.after(0, self.add_message, "JoSi", f"Error in test flow: {str(e)}", True)
-        finally:
-            self.after(0, self.enable_input)
+            self.post_ui("add_message", "JoSi", f"Error in test flow: {str(e)}", True)
 
     def process_normal_message(self, user_text):
         """
         Get normal chat response from Gemini and display it.
         """
+        # Stream tokens into the chat as they arrive, then re-render as Markdown
+        self.post_ui("begin_stream", "JoSi")
         try:
-            resp = self.get_response(user_text)
+            resp = self.get_response(
+                user_text,
+                on_token=lambda text: self.post_ui("append_token", text)
+            )
             is_error = resp.startswith("Error")
-            self.conversation_history.append({'sender': 'JoSi', 'text': resp})
-            self.after(0, self.add_message, "JoSi", resp, is_error)
+            # Errors stay out of the history sent with later prompts
+            if not is_error and resp.strip():
+                self.remember('JoSi', resp)
+            self.post_ui("end_stream", resp, is_error)
         except Exception as e:
-            self.after(0, self.add_message, "JoSi", f"Error: {str(e)}", True)
-        finally:
-            self.after(0, self.enable_input)
+            self.post_ui("end_stream", f"Error: {str(e)}", True)
 
 
 # 8. MAIN